@@ -27,12 +27,24 @@ Prevent: AST scanning catches raw DB imports outside the approved module
 """
 
 import ast
+import bisect
+import functools
+import json
 import os
 import re
+import sys
 import unittest
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import NamedTuple
 
+try:
+    import xxhash  # Optional: enables the on-disk scan cache
+except ImportError:
+    xxhash = None
+
 
 class Violation(NamedTuple):
     file: str
@@ -69,47 +81,489 @@ VERIFIED_SINGLE_ROW_LOOKUPS: set[str] = {
 # Route registration file
 ROUTES_FILE = "src/routes.py"
 
-# Pattern that registers an endpoint (customize the regex)
-ROUTE_REGISTRATION_PATTERN = re.compile(
-    r"router\.(include_router|add_api_route|get|post|put|delete)\("
+# Directory containing endpoint files (top level only; subdirectories
+# are not scanned)
+ENDPOINTS_DIR = "src/endpoints"
+
+# Files exempt from the DB import check, normalized like get_python_files()
+_WRAPPER_SET = frozenset({os.path.normpath(DB_WRAPPER_MODULE)})
+
+# Directories never scanned (virtual envs, caches, VCS metadata)
+_EXCLUDED_DIRS = frozenset({"__pycache__", ".venv", "venv", "node_modules", ".git"})
+
+# Hashed lookup for forbidden imports, checked against each dotted prefix
+_FORBIDDEN = frozenset(FORBIDDEN_DB_IMPORTS)
+
+# Textual pre-filter: any forbidden import must mention its root package.
+# Roots rather than full names, since "import sqlalchemy . engine" is legal.
+_DB_TRIP = re.compile(
+    "|".join(
+        re.escape(root)
+        for root in sorted({name.split(".", 1)[0] for name in FORBIDDEN_DB_IMPORTS})
+    )
 )
 
-# Directory containing endpoint files
-ENDPOINTS_DIR = "src/endpoints"
+# Patterns that indicate multi-row queries
+_MULTI_ROW_RE = re.compile(r"\.(?:all|filter|filter_by|select|query)\s*\(")
+
+# Patterns that indicate pagination is present (method calls or slice syntax)
+_PAGINATION_RE = re.compile(
+    r"\.(?:limit|paginate|first)\s*\(|\[\s*\d*\s*:\s*\d*\s*\]"
+)
+
+# Both probes fused into one alternation so each file is scanned once
+_COMBINED_RE = re.compile(
+    f"(?P<multi>{_MULTI_ROW_RE.pattern})|(?P<page>{_PAGINATION_RE.pattern})"
+)
 
+# AST-only compile; on Python 3.13+ also constant-folds the tree, which
+# shrinks it without touching the line spans and imports the checks read
+_PARSE_FLAGS = ast.PyCF_ONLY_AST | getattr(ast, "PyCF_OPTIMIZED_AST", 0)
+
+# Line breaks, used to map match offsets back to line numbers
+_NEWLINE_RE = re.compile("\n")
+
+# Lines before/after a multi-row query searched for pagination
+_CONTEXT_BEFORE = 2
+_CONTEXT_AFTER = 4
+
+# Below this many files, process pool startup costs more than it saves
+_PARALLEL_MIN_FILES = 200
+
+# Per-file scan results from earlier runs (used when xxhash is installed).
+# Bump the version if the cache layout changes.
+_CACHE_ROOT = ".pytest_cache"
+_CACHE_FILE = os.path.join(_CACHE_ROOT, "architecture_guard", "cache.json")
+_CACHE_VERSION = 1
 
-def get_python_files(directory: str) -> list[str]:
-    """Recursively get all Python files in a directory."""
-    files = []
-    root = Path(directory)
 
-    if not root.exists():
+def get_python_files(directory: str) -> list[str]:
+    """Recursively get all Python files in a directory, as normalized paths."""
+    files: list[str] = []
+    if not os.path.isdir(directory):
         return files
 
-    for path in root.rglob("*.py"):
-        # Skip test files, __pycache__, and virtual envs
-        parts = path.parts
-        if any(
-            p in ("__pycache__", ".venv", "venv", "node_modules", ".git")
-            for p in parts
-        ):
-            continue
-        if path.name.startswith("test_") or path.name.endswith("_test.py"):
+    # Excluded directories are pruned before descending, never listed
+    pending = [directory]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in _EXCLUDED_DIRS:
+                        pending.append(entry.path)
+                # Skip test files by name alone; no Path objects in this loop
+                elif (
+                    name.endswith(".py")
+                    and not name.startswith("test_")
+                    and not name.endswith("_test.py")
+                    and entry.is_file()
+                ):
+                    # Interned: the path is shared by every cache key and
+                    # Violation that refers to this file
+                    files.append(sys.intern(os.path.normpath(entry.path)))
+
+    files.sort()
+    return files
+
+
+@functools.lru_cache(maxsize=None)
+def _all_src_files() -> tuple[str, ...]:
+    """Walk SRC_DIR once per test session; every per-file check shares it."""
+    return tuple(get_python_files(SRC_DIR))
+
+
+@functools.lru_cache(maxsize=None)
+def _load(filepath: str) -> str:
+    """
+    Read a file once and return its source.
+
+    Every test goes through this cache, so each file is read and decoded at
+    most once per run. No per-line copy is kept; callers that need line
+    numbers map offsets with bisect instead.
+    """
+    return Path(filepath).read_text(encoding="utf-8", errors="replace")
+
+
+def _is_forbidden(name: str) -> bool:
+    """Check whether a module name or any of its dotted parents is forbidden."""
+    while True:
+        if name in _FORBIDDEN:
+            return True
+        if "." not in name:
+            return False
+        name = name.rsplit(".", 1)[0]
+
+
+def _iter_imports(tree: ast.Module) -> Iterator[ast.Import | ast.ImportFrom]:
+    """
+    Yield every Import/ImportFrom statement in a module.
+
+    Only statement bodies are descended into (if/try/with/for/while/match
+    blocks, plus function and class bodies for lazy imports); expressions,
+    which make up most of a tree, are never visited.
+    """
+    pending: list[ast.stmt] = list(reversed(tree.body))
+    while pending:
+        node = pending.pop()
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
             continue
-        files.append(str(path))
 
-    return files
+        children: list[ast.stmt] = []
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if isinstance(block, list):
+                children.extend(block)
+        for handler in getattr(node, "handlers", ()):
+            children.extend(handler.body)
+        for case in getattr(node, "cases", ()):
+            children.extend(case.body)
+        pending.extend(reversed(children))
+
+
+def _imported_names(tree: ast.Module) -> set[str]:
+    """
+    Collect the short names a module imports.
+
+    "from pkg.endpoints import users" yields {"endpoints", "users"};
+    "import pkg.endpoints.users" yields {"users"}.
+    """
+    names: set[str] = set()
+    for node in _iter_imports(tree):
+        if isinstance(node, ast.ImportFrom):
+            if node.module:
+                names.add(node.module.rsplit(".", 1)[-1])
+            names.update(alias.name for alias in node.names)
+        else:
+            names.update(alias.name.rsplit(".", 1)[-1] for alias in node.names)
+    return names
+
 
+# Files parse_file() rejected in this process. Whether a file parses depends
+# on the interpreter's grammar, so their results are never cached on disk.
+_PARSE_FAILURES: set[str] = set()
 
+
+@functools.lru_cache(maxsize=None)
 def parse_file(filepath: str) -> ast.Module | None:
     """Parse a Python file into an AST, returning None on failure."""
     try:
-        with open(filepath) as f:
-            return ast.parse(f.read(), filename=filepath)
-    except (SyntaxError, UnicodeDecodeError):
+        return compile(
+            _load(filepath),
+            filepath,
+            "exec",
+            flags=_PARSE_FLAGS,
+            dont_inherit=True,
+            optimize=2,
+        )
+    except (SyntaxError, ValueError):
+        _PARSE_FAILURES.add(filepath)
         return None
 
 
+class _FunctionSpanCollector(ast.NodeVisitor):
+    """Record outermost function spans without descending into their bodies."""
+
+    def __init__(self) -> None:
+        self.spans: list[tuple[int, int, str]] = []
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        if node.end_lineno:
+            self.spans.append((node.lineno, node.end_lineno, node.name))
+        # No generic_visit(): nested functions belong to this span
+
+    visit_AsyncFunctionDef = visit_FunctionDef  # type: ignore[assignment]
+
+
+@functools.lru_cache(maxsize=None)
+def _function_spans(filepath: str) -> tuple[list[int], list[tuple[int, int, str]]]:
+    """
+    Collect (lineno, end_lineno, name) for every outermost function in a file.
+
+    Nested functions are not descended into, so the spans never overlap and
+    can be searched with bisect. Returns (start_lines, spans), both sorted.
+    """
+    tree = parse_file(filepath)
+    if tree is None:
+        return [], []
+
+    collector = _FunctionSpanCollector()
+    collector.visit(tree)
+    spans = collector.spans
+
+    spans.sort()
+    return [start for start, _, _ in spans], spans
+
+
+def _find_import_violations(filepath: str) -> list[Violation]:
+    """Find forbidden DB imports in a single file."""
+    violations: list[Violation] = []
+    if filepath in _WRAPPER_SET:
+        return violations
+
+    # Most files never mention a DB package; skip parsing those entirely
+    if not _DB_TRIP.search(_load(filepath)):
+        return violations
+
+    tree = parse_file(filepath)
+    if tree is None:
+        return violations
+
+    for node in _iter_imports(tree):
+        # Check 'import X' statements
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if _is_forbidden(alias.name):
+                    violations.append(
+                        Violation(
+                            file=filepath,
+                            line=node.lineno,
+                            message=(
+                                f"Direct import of '{alias.name}' — "
+                                f"use {DB_WRAPPER_MODULE} instead"
+                            ),
+                        )
+                    )
+        # Check 'from X import Y' statements
+        elif node.module and _is_forbidden(node.module):
+            violations.append(
+                Violation(
+                    file=filepath,
+                    line=node.lineno,
+                    message=(
+                        f"Direct import from '{node.module}' — "
+                        f"use {DB_WRAPPER_MODULE} instead"
+                    ),
+                )
+            )
+
+    return violations
+
+
+def _find_pagination_violations(filepath: str) -> list[Violation]:
+    """Find multi-row queries without nearby pagination in a single file."""
+    violations: list[Violation] = []
+    source = _load(filepath)
+
+    # Offset of the first character of each line, for mapping matches back.
+    # Only "\n" counts, matching the AST's line numbering.
+    line_offsets = [0]
+    line_offsets.extend(m.end() for m in _NEWLINE_RE.finditer(source))
+    line_offsets.append(len(source) + 1)
+
+    # Single scan of the whole file: classify lines as multi-row and/or paginated
+    multi_lines: list[int] = []
+    page_lines: set[int] = set()
+    for match in _COMBINED_RE.finditer(source):
+        i = bisect.bisect_right(line_offsets, match.start())
+        if match["multi"] is not None:
+            if not multi_lines or multi_lines[-1] != i:
+                multi_lines.append(i)
+        else:
+            page_lines.add(i)
+
+    for i in multi_lines:
+        # Check if this is a verified single-row lookup
+        func_name = _get_enclosing_function(filepath, i)
+        lookup_key = f"{filepath}:{func_name}" if func_name else ""
+
+        if lookup_key in VERIFIED_SINGLE_ROW_LOOKUPS:
+            continue
+
+        # Check surrounding lines for pagination
+        if any(
+            n in page_lines
+            for n in range(i - _CONTEXT_BEFORE, i + _CONTEXT_AFTER + 1)
+        ):
+            continue
+
+        line = source[line_offsets[i - 1] : line_offsets[i] - 1]
+        violations.append(
+            Violation(
+                file=filepath,
+                line=i,
+                message=(
+                    f"Multi-row query without pagination: "
+                    f"{line.strip()}"
+                ),
+            )
+        )
+
+    return violations
+
+
+def _scan_file(filepath: str) -> tuple[list[Violation], list[Violation], bool]:
+    """
+    Run every per-file check.
+
+    Returns (import violations, pagination violations, cacheable), where
+    cacheable is False if the file failed to parse on this interpreter.
+    """
+    imports = _find_import_violations(filepath)
+    pagination = _find_pagination_violations(filepath)
+    return imports, pagination, filepath not in _PARSE_FAILURES
+
+
+# (import_violations, pagination_violations) across SRC_DIR, filled once
+# by setUpModule so both per-file tests share a single scan.
+_SCAN_RESULTS: tuple[list[Violation], list[Violation]] | None = None
+
+
+def _scan_files(
+    files: list[str],
+) -> list[tuple[list[Violation], list[Violation], bool]]:
+    """Scan files, in a process pool when there are enough to pay for it."""
+    if len(files) >= _PARALLEL_MIN_FILES:
+        try:
+            with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as ex:
+                return list(ex.map(_scan_file, files, chunksize=16))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No multiprocessing support here (e.g. sandboxed CI) — run serially
+            pass
+    return [_scan_file(filepath) for filepath in files]
+
+
+def _rules_fingerprint() -> str:
+    """
+    Identify the rules that produced cached results.
+
+    Hashes this module's own source, so editing any constant above (or the
+    checks themselves) invalidates the whole cache. The interpreter and
+    parse flags are included too, since they decide which files parse.
+    """
+    assert xxhash is not None
+    hasher = xxhash.xxh3_128(
+        f"v{_CACHE_VERSION}:{sys.implementation.cache_tag}:"
+        f"{sys.version_info[:2]}:{_PARSE_FLAGS}:".encode()
+    )
+    hasher.update(Path(__file__).read_bytes())
+    return hasher.hexdigest()
+
+
+def _read_scan_cache(fingerprint: str) -> dict[str, dict]:
+    """Load cached per-file results, or nothing if missing, corrupt or stale."""
+    try:
+        with open(_CACHE_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("rules") != fingerprint:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def _write_scan_cache(fingerprint: str, files: dict[str, dict]) -> None:
+    """Persist per-file results; a read-only checkout just goes uncached."""
+    tmp_path = f"{_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(_CACHE_FILE), exist_ok=True)
+        # pytest ignores its cache dir itself; under plain unittest we may be
+        # the one creating it, so keep it out of git the same way
+        gitignore = os.path.join(_CACHE_ROOT, ".gitignore")
+        if not os.path.exists(gitignore):
+            with open(gitignore, "w", encoding="utf-8") as f:
+                f.write("*\n")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"rules": fingerprint, "files": files}, f)
+        os.replace(tmp_path, _CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _cached_violations(filepath: str, rows: object) -> list[Violation]:
+    """Rebuild violations from a cache entry; ValueError if it's malformed."""
+    if not isinstance(rows, list):
+        raise ValueError(f"Malformed cache entry for {filepath}")
+    violations: list[Violation] = []
+    for row in rows:
+        if not (
+            isinstance(row, list)
+            and len(row) == 2
+            and isinstance(row[0], int)
+            and isinstance(row[1], str)
+        ):
+            raise ValueError(f"Malformed cache entry for {filepath}")
+        violations.append(Violation(filepath, row[0], row[1]))
+    return violations
+
+
+def _scan_all(files: Sequence[str]) -> tuple[list[Violation], list[Violation]]:
+    """
+    Scan files, reusing cached results for files whose content is unchanged.
+
+    The on-disk cache needs the optional xxhash package; without it every
+    file is scanned on every run.
+    """
+    results: dict[str, tuple[list[Violation], list[Violation]]] = {}
+    digests: dict[str, str] = {}
+    fingerprint = ""
+
+    if xxhash is not None:
+        fingerprint = _rules_fingerprint()
+        cached = _read_scan_cache(fingerprint)
+        for filepath in files:
+            # Hash the decoded source _load() caches, so a stale file is read
+            # once; the scan only ever sees this text anyway
+            digest = xxhash.xxh3_128_hexdigest(_load(filepath).encode())
+            digests[filepath] = digest
+            entry = cached.get(filepath)
+            if isinstance(entry, dict) and entry.get("hash") == digest:
+                try:
+                    results[filepath] = (
+                        _cached_violations(filepath, entry["imports"]),
+                        _cached_violations(filepath, entry["pagination"]),
+                    )
+                except (KeyError, ValueError):
+                    # Malformed entry — treat it as a miss and rescan
+                    pass
+
+    stale = [filepath for filepath in files if filepath not in results]
+    uncacheable: set[str] = set()
+    for filepath, (imports, pagination, cacheable) in zip(stale, _scan_files(stale)):
+        results[filepath] = (imports, pagination)
+        if not cacheable:
+            uncacheable.add(filepath)
+
+    # Rewrite only when something new can be cached; an all-hit run is read-only
+    if xxhash is not None and len(uncacheable) < len(stale):
+        _write_scan_cache(
+            fingerprint,
+            {
+                filepath: {
+                    "hash": digests[filepath],
+                    "imports": [[v.line, v.message] for v in imports],
+                    "pagination": [[v.line, v.message] for v in pagination],
+                }
+                for filepath, (imports, pagination) in results.items()
+                if filepath not in uncacheable
+            },
+        )
+
+    import_violations: list[Violation] = []
+    pagination_violations: list[Violation] = []
+    for filepath in files:
+        imports, pagination = results[filepath]
+        import_violations.extend(imports)
+        pagination_violations.extend(pagination)
+    return import_violations, pagination_violations
+
+
+def setUpModule() -> None:
+    """Scan SRC_DIR once for every per-file rule before the tests run."""
+    global _SCAN_RESULTS
+    _SCAN_RESULTS = _scan_all(_all_src_files())
+
+
+def _scan_results() -> tuple[list[Violation], list[Violation]]:
+    """Return the shared scan, running it if setUpModule was bypassed."""
+    if _SCAN_RESULTS is None:
+        setUpModule()
+    assert _SCAN_RESULTS is not None
+    return _SCAN_RESULTS
+
+
 class TestDatabaseAccessBoundary(unittest.TestCase):
     """
     Enforces single database access point.
@@ -120,60 +574,14 @@ class TestDatabaseAccessBoundary(unittest.TestCase):
     """
 
     def test_no_direct_db_imports(self) -> None:
-        violations: list[Violation] = []
-        files = get_python_files(SRC_DIR)
-        wrapper = os.path.normpath(DB_WRAPPER_MODULE)
-
-        for filepath in files:
-            normalized = os.path.normpath(filepath)
-            if normalized == wrapper:
-                continue
-
-            tree = parse_file(filepath)
-            if tree is None:
-                continue
-
-            for node in ast.walk(tree):
-                # Check 'import X' statements
-                if isinstance(node, ast.Import):
-                    for alias in node.names:
-                        for forbidden in FORBIDDEN_DB_IMPORTS:
-                            if alias.name == forbidden or alias.name.startswith(
-                                forbidden + "."
-                            ):
-                                violations.append(
-                                    Violation(
-                                        file=filepath,
-                                        line=node.lineno,
-                                        message=(
-                                            f"Direct import of '{alias.name}' — "
-                                            f"use {DB_WRAPPER_MODULE} instead"
-                                        ),
-                                    )
-                                )
-
-                # Check 'from X import Y' statements
-                if isinstance(node, ast.ImportFrom) and node.module:
-                    for forbidden in FORBIDDEN_DB_IMPORTS:
-                        if node.module == forbidden or node.module.startswith(
-                            forbidden + "."
-                        ):
-                            violations.append(
-                                Violation(
-                                    file=filepath,
-                                    line=node.lineno,
-                                    message=(
-                                        f"Direct import from '{node.module}' — "
-                                        f"use {DB_WRAPPER_MODULE} instead"
-                                    ),
-                                )
-                            )
+        violations = _scan_results()[0]
 
         if violations:
-            msg = f"\nFound {len(violations)} forbidden DB import(s):\n\n"
-            for v in violations:
-                msg += f"  {v.file}:{v.line} — {v.message}\n"
-            msg += f"\nOnly {DB_WRAPPER_MODULE} may import these packages."
+            body = "\n".join(f"  {v.file}:{v.line} — {v.message}" for v in violations)
+            msg = (
+                f"\nFound {len(violations)} forbidden DB import(s):\n\n{body}\n"
+                f"\nOnly {DB_WRAPPER_MODULE} may import these packages."
+            )
             self.fail(msg)
 
 
@@ -187,58 +595,12 @@ class TestPaginationEnforcement(unittest.TestCase):
     """
 
     def test_multi_row_queries_have_pagination(self) -> None:
-        violations: list[Violation] = []
-        files = get_python_files(SRC_DIR)
-
-        # Patterns that indicate multi-row queries
-        multi_row_patterns = re.compile(
-            r"\.(all|filter|filter_by|select|query)\s*\("
-        )
-
-        # Patterns that indicate pagination is present (method calls)
-        pagination_call_patterns = re.compile(
-            r"\.(limit|paginate|first)\s*\("
-        )
-        # Patterns that indicate pagination is present (slice syntax)
-        pagination_slice_patterns = re.compile(
-            r"\[\s*\d*\s*:\s*\d*\s*\]"
-        )
-
-        for filepath in files:
-            with open(filepath) as f:
-                lines = f.readlines()
-
-            for i, line in enumerate(lines, 1):
-                if multi_row_patterns.search(line):
-                    # Check if this is a verified single-row lookup
-                    func_name = _get_enclosing_function(filepath, i)
-                    lookup_key = f"{filepath}:{func_name}" if func_name else ""
-
-                    if lookup_key in VERIFIED_SINGLE_ROW_LOOKUPS:
-                        continue
-
-                    # Check surrounding lines (within 5 lines) for pagination
-                    context_start = max(0, i - 3)
-                    context_end = min(len(lines), i + 5)
-                    context = "".join(lines[context_start:context_end])
-
-                    if not (pagination_call_patterns.search(context) or pagination_slice_patterns.search(context)):
-                        violations.append(
-                            Violation(
-                                file=filepath,
-                                line=i,
-                                message=(
-                                    f"Multi-row query without pagination: "
-                                    f"{line.strip()}"
-                                ),
-                            )
-                        )
+        violations = _scan_results()[1]
 
         if violations:
-            msg = f"\nFound {len(violations)} query(ies) without pagination:\n\n"
-            for v in violations:
-                msg += f"  {v.file}:{v.line} — {v.message}\n"
-            msg += (
+            body = "\n".join(f"  {v.file}:{v.line} — {v.message}" for v in violations)
+            msg = (
+                f"\nFound {len(violations)} query(ies) without pagination:\n\n{body}\n"
                 "\nFix: Add .limit() or add to VERIFIED_SINGLE_ROW_LOOKUPS "
                 "if this is intentionally unbounded."
             )
@@ -255,50 +617,54 @@ class TestRegistrationConsistency(unittest.TestCase):
     """
 
     def test_all_endpoints_registered(self) -> None:
-        if not os.path.exists(ENDPOINTS_DIR):
+        if not os.path.isdir(ENDPOINTS_DIR):
             self.skipTest(f"No endpoints directory at {ENDPOINTS_DIR}")
 
         if not os.path.exists(ROUTES_FILE):
             self.skipTest(f"No routes file at {ROUTES_FILE}")
 
-        # Get endpoint module names
-        endpoint_modules = set()
-        for filepath in get_python_files(ENDPOINTS_DIR):
-            module_name = Path(filepath).stem
-            if module_name != "__init__":
-                endpoint_modules.add(module_name)
+        # Get endpoint module names (endpoints live directly in ENDPOINTS_DIR)
+        with os.scandir(ENDPOINTS_DIR) as entries:
+            endpoint_modules = {
+                entry.name[:-3]
+                for entry in entries
+                if entry.name.endswith(".py")
+                and entry.name != "__init__.py"
+                and not entry.name.startswith("test_")
+                and not entry.name.endswith("_test.py")
+                and entry.is_file()
+            }
 
         if not endpoint_modules:
             return
 
-        # Read routes file and find registered modules
-        with open(ROUTES_FILE) as f:
-            routes_content = f.read()
+        # Parse routes file and find imported modules
+        tree = parse_file(ROUTES_FILE)
+        if tree is None:
+            self.fail(f"Could not parse {ROUTES_FILE}")
 
-        unregistered = []
-        for module in sorted(endpoint_modules):
-            if module not in routes_content:
-                unregistered.append(module)
+        unregistered = sorted(endpoint_modules - _imported_names(tree))
 
         if unregistered:
-            msg = f"\nFound {len(unregistered)} unregistered endpoint(s):\n\n"
-            for module in unregistered:
-                msg += f"  - {module} (in {ENDPOINTS_DIR}/{module}.py)\n"
-            msg += f"\nRegister them in {ROUTES_FILE}."
+            body = "\n".join(
+                f"  - {module} (in {ENDPOINTS_DIR}/{module}.py)"
+                for module in unregistered
+            )
+            msg = (
+                f"\nFound {len(unregistered)} unregistered endpoint(s):\n\n{body}\n"
+                f"\nRegister them in {ROUTES_FILE}."
+            )
             self.fail(msg)
 
 
 def _get_enclosing_function(filepath: str, line_number: int) -> str | None:
     """Get the name of the function containing a given line number."""
-    tree = parse_file(filepath)
-    if tree is None:
-        return None
-
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            if hasattr(node, "end_lineno") and node.end_lineno:
-                if node.lineno <= line_number <= node.end_lineno:
-                    return node.name
+    starts, spans = _function_spans(filepath)
+    index = bisect.bisect_right(starts, line_number) - 1
+    if index >= 0:
+        _, end_lineno, name = spans[index]
+        if line_number <= end_lineno:
+            return name
 
     return None
 